@@ -1,17 +1,44 @@
-import redis.asyncio as redis
+import asyncio
+
 from src.conf.config import settings
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 import uvicorn
-from src.routes import contacts, auth, users
+from src.routes import contacts, auth, users, audit
 from fastapi_limiter import FastAPILimiter
 from fastapi.middleware.cors import CORSMiddleware
 from src.conf.config import settings
+from src.database.db import SessionLocal
+from src.repository import audit as repository_audit
+from src.repository import contacts as repository_contacts
+from src.services.admission import AdmissionControlMiddleware, overloaded_response
+from src.services.audit import audit_log
+from src.services.events import contact_events
+from src.services.stats import contact_stats
+from src.services.redis_client import redis_client
 
 app = FastAPI()
 
 app.include_router(contacts.router, prefix="/api")
 app.include_router(auth.router, prefix="/api")
 app.include_router(users.router, prefix="/api")
+app.include_router(audit.router, prefix="/api")
+
+# added first, so it runs inside CORSMiddleware and its 503 responses carry
+# the CORS headers browsers need to see them
+app.add_middleware(
+    AdmissionControlMiddleware,
+    limits={
+        "auth": settings.admission_auth_limit,
+        "reads": settings.admission_read_limit,
+        "writes": settings.admission_write_limit,
+        "uploads": settings.admission_upload_limit,
+    },
+    queue_size=settings.admission_queue_size,
+    timeout=settings.admission_queue_timeout,
+    # long-lived streams would hold a read slot for their whole lifetime
+    exempt=["/api/contacts/stream"],
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,16 +49,76 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    return overloaded_response()
+
+
 @app.on_event("startup")
 async def startup():
-    r = await redis.Redis(
-        host=settings.redis_host,
-        port=settings.redis_port,
-        db=0,
-        encoding="utf-8",
-        decode_responses=True,
-    )
-    await FastAPILimiter.init(r)
+    await FastAPILimiter.init(redis_client)
+    await audit_log.start()
+    app.state.jobs = [
+        asyncio.create_task(
+            run_periodically(reconcile_stats, settings.stats_reconcile_seconds)
+        ),
+        asyncio.create_task(keep_audit_partitions()),
+    ]
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    for job in app.state.jobs:
+        job.cancel()
+    await contact_events.close()
+    await audit_log.close()
+
+
+async def run_periodically(job, seconds: float):
+    while True:
+        await asyncio.sleep(seconds)
+        try:
+            await job()
+        except Exception as e:
+            print(e)
+
+
+async def keep_audit_partitions(max_backoff: float = 60):
+    # Until the first run succeeds audit inserts have no partition to go to,
+    # so it is retried with a short backoff instead of an hour later; a worker
+    # must boot without the database all the same
+    backoff = 1
+    while True:
+        try:
+            await maintain_audit_partitions()
+            break
+        except Exception as e:
+            print(e)
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, max_backoff)
+    await run_periodically(maintain_audit_partitions, settings.audit_partition_seconds)
+
+
+async def reconcile_stats():
+    # every worker schedules the job, the lease lets one of them run it
+    if not await contact_stats.claim_reconcile(settings.stats_reconcile_seconds):
+        return
+    db = SessionLocal()
+    try:
+        await repository_contacts.reconcile_stats(db)
+    finally:
+        db.close()
+
+
+async def maintain_audit_partitions():
+    db = SessionLocal()
+    try:
+        await repository_audit.ensure_partitions(db)
+        await repository_audit.drop_expired_partitions(
+            db, settings.audit_retention_months
+        )
+    finally:
+        db.close()
 
 
 @app.get("/")
@@ -0,0 +1,41 @@
+"""'Audit events'
+
+Revision ID: 3fca82e4223f
+Revises: 6edef3cbece3
+Create Date: 2026-10-19 18:22:09.640127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '3fca82e4223f'
+down_revision: Union[str, None] = '6edef3cbece3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(sa.schema.CreateSequence(sa.Sequence('audit_events_id_seq')))
+    op.create_table('audit_events',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('action', sa.String(length=50), nullable=False),
+    sa.Column('entity', sa.String(length=20), nullable=True),
+    sa.Column('entity_id', sa.Integer(), nullable=True),
+    sa.Column('details', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.PrimaryKeyConstraint('id', 'created_at'),
+    postgresql_partition_by='RANGE (created_at)'
+    )
+    op.create_index('ix_audit_events_user_id_id', 'audit_events', ['user_id', 'id'], unique=False)
+    # monthly partitions are created by the partition job started with the app
+
+
+def downgrade() -> None:
+    op.drop_index('ix_audit_events_user_id_id', table_name='audit_events')
+    op.drop_table('audit_events')
+    op.execute(sa.schema.DropSequence(sa.Sequence('audit_events_id_seq')))
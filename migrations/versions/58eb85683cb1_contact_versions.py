@@ -0,0 +1,48 @@
+"""'Contact versions and tombstones'
+
+Revision ID: 58eb85683cb1
+Revises: a3b636fe709b
+Create Date: 2026-10-19 10:12:04.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '58eb85683cb1'
+down_revision: Union[str, None] = 'a3b636fe709b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(sa.schema.CreateSequence(sa.Sequence('contact_version_seq')))
+    op.add_column('contacts', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.add_column('contacts', sa.Column('version', sa.BigInteger(), nullable=True))
+    op.execute(
+        "UPDATE contacts SET version = nextval('contact_version_seq'), updated_at = now()"
+    )
+    op.alter_column('contacts', 'version', nullable=False)
+    op.create_index('ix_contacts_user_id_version', 'contacts', ['user_id', 'version'], unique=False)
+    op.create_table('contact_tombstones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('contact_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_contact_tombstones_user_id_version', 'contact_tombstones', ['user_id', 'version'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contact_tombstones_user_id_version', table_name='contact_tombstones')
+    op.drop_table('contact_tombstones')
+    op.drop_index('ix_contacts_user_id_version', table_name='contacts')
+    op.drop_column('contacts', 'version')
+    op.drop_column('contacts', 'updated_at')
+    op.execute(sa.schema.DropSequence(sa.Sequence('contact_version_seq')))
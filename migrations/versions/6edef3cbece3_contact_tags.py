@@ -0,0 +1,30 @@
+"""'Contact tags'
+
+Revision ID: 6edef3cbece3
+Revises: 8f44b66725b5
+Create Date: 2026-10-19 16:03:52.771349
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '6edef3cbece3'
+down_revision: Union[str, None] = '8f44b66725b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # lets the GIN index lead with the integer user_id
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gin')
+    op.add_column('contacts', sa.Column('tags', postgresql.ARRAY(sa.String(length=30)), server_default='{}', nullable=False))
+    op.create_index('ix_contacts_user_id_tags', 'contacts', ['user_id', 'tags'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_tags', table_name='contacts', postgresql_using='gin')
+    op.drop_column('contacts', 'tags')
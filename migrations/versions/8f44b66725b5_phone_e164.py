@@ -0,0 +1,45 @@
+"""'Phones in E.164 form'
+
+Revision ID: 8f44b66725b5
+Revises: 58eb85683cb1
+Create Date: 2026-10-19 14:41:27.905114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f44b66725b5'
+down_revision: Union[str, None] = '58eb85683cb1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# the country the stored numbers were collected in; fixed here so that the
+# conversion does not depend on the settings of whoever runs the migration
+COUNTRY_CODE = '380'
+
+
+def upgrade() -> None:
+    # integers lost the trunk zero, so stored values are national numbers
+    op.alter_column('contacts', 'phone',
+               existing_type=sa.Integer(),
+               type_=sa.String(length=16),
+               existing_nullable=True,
+               postgresql_using=f"'+{COUNTRY_CODE}' || phone::text")
+    op.create_index('ix_contacts_user_id_phone', 'contacts', ['user_id', 'phone'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_phone', table_name='contacts')
+    # numbers from other countries or too long for an integer are dropped
+    op.alter_column('contacts', 'phone',
+               existing_type=sa.String(length=16),
+               type_=sa.Integer(),
+               existing_nullable=True,
+               postgresql_using=(
+                   f"CASE WHEN phone ~ '^\\+{COUNTRY_CODE}[0-9]{{1,9}}$' "
+                   f"THEN substr(phone, {len(COUNTRY_CODE) + 2})::integer END"
+               ))
@@ -0,0 +1,115 @@
+"""CPU time of duplicate detection over synthetic contact lists.
+
+Run from the project root: python -m scripts.bench_duplicates [contacts]
+"""
+
+import random
+import string
+import sys
+import time
+from collections import Counter
+
+from src.services.duplicates import find_clusters
+
+FIRSTNAMES = [
+    "James",
+    "Mary",
+    "John",
+    "Linda",
+    "Robert",
+    "Anna",
+    "Michael",
+    "Olena",
+    "David",
+    "Maria",
+]
+LASTNAMES = [
+    "Smith",
+    "Johnson",
+    "Brown",
+    "Shevchenko",
+    "Miller",
+    "Davis",
+    "Wilson",
+    "Kovalenko",
+]
+
+
+def random_name(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_lowercase, k=7)).capitalize()
+
+
+def distinct_names(rng: random.Random, count: int) -> list:
+    return [
+        (
+            i,
+            random_name(rng),
+            random_name(rng),
+            f"user{i}@example.com",
+            f"+38067{i:07d}",
+        )
+        for i in range(count)
+    ]
+
+
+def common_names(rng: random.Random, count: int) -> list:
+    return [
+        (
+            i,
+            rng.choice(FIRSTNAMES),
+            rng.choice(LASTNAMES),
+            f"user{i}@example.com",
+            f"+38067{i:07d}",
+        )
+        for i in range(count)
+    ]
+
+
+def with_duplicates(rng: random.Random, count: int) -> list:
+    # every tenth contact is re-entered with a typo and another mail domain
+    rows = distinct_names(rng, count)
+    for i in range(0, count, 10):
+        _, firstname, lastname, email, _ = rows[i]
+        typo = firstname + firstname[-1]
+        rows.append(
+            (count + i, typo, lastname, email.replace("example.com", "mail.com"), None)
+        )
+    return rows
+
+
+def shared_mailboxes(rng: random.Random, count: int) -> list:
+    # worst case: every mailbox name is used twice, so every name is coded
+    return [
+        (
+            i,
+            random_name(rng),
+            random_name(rng),
+            f"user{i // 2}@example{i % 2}.com",
+            f"+38067{i:07d}",
+        )
+        for i in range(count)
+    ]
+
+
+def measure(name: str, rows: list) -> None:
+    start = time.process_time()
+    clusters = find_clusters(rows)
+    elapsed = time.process_time() - start
+    sizes = Counter(len(ids) for ids, _ in clusters)
+    largest = max(sizes, default=0)
+    print(
+        f"{name:16} {len(rows):>7} rows  {elapsed:6.3f}s cpu  {len(clusters):>6} clusters  largest {largest}"
+    )
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(42)
+    measure("distinct names", distinct_names(rng, count))
+    measure("common names", common_names(rng, count))
+    measure("with duplicates", with_duplicates(rng, count))
+    measure("shared mailboxes", shared_mailboxes(rng, count))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Per-call cost of the hot lookups: queries built per call vs cached select().
+
+"built" rebuilds the ORM query on every call, the way the repository did
+before; "cached" runs the module-level select() statements with new bound
+values only. Wall time includes the database round trip, CPU time is the
+Python side that the statement cache saves. Rows are inserted in a
+transaction that is rolled back at the end.
+
+Run from the project root with the usual .env:
+python -m scripts.bench_statements [calls]
+"""
+
+import sys
+import time
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from src.database.db import engine
+from src.database.models import Contact, User
+from src.repository.contacts import GET_CONTACT, _search_statement
+from src.repository.users import GET_USER_BY_EMAIL
+
+
+def measure(name: str, call, calls: int) -> None:
+    call()
+    wall, cpu = time.perf_counter(), time.process_time()
+    for _ in range(calls):
+        call()
+    wall = (time.perf_counter() - wall) / calls * 1e6
+    cpu = (time.process_time() - cpu) / calls * 1e6
+    print(f"{name:24} {wall:8.1f}us wall  {cpu:8.1f}us cpu")
+
+
+def main() -> None:
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        db = Session(bind=connection)
+        user = User(email="bench@example.com", password="x")
+        contact = Contact(
+            firstname="Bench", lastname="Mark", email="bench@example.com", user=user
+        )
+        db.add_all([user, contact])
+        db.flush()
+        contact_id, user_id = contact.id, user.id
+        search = _search_statement(None)
+
+        measure(
+            "get_contact built",
+            lambda: db.query(Contact)
+            .filter(and_(Contact.id == contact_id, Contact.user_id == user_id))
+            .first(),
+            calls,
+        )
+        measure(
+            "get_contact cached",
+            lambda: db.scalars(
+                GET_CONTACT, {"contact_id": contact_id, "user_id": user_id}
+            ).first(),
+            calls,
+        )
+        measure(
+            "search built",
+            lambda: db.query(Contact)
+            .filter(
+                and_(
+                    Contact.user_id == user_id,
+                    or_(
+                        Contact.firstname == "Mark",
+                        Contact.lastname == "Mark",
+                        Contact.email == "Mark",
+                    ),
+                )
+            )
+            .first(),
+            calls,
+        )
+        measure(
+            "search cached",
+            lambda: db.scalars(
+                search, {"user_id": user_id, "search_word": "Mark"}
+            ).first(),
+            calls,
+        )
+        measure(
+            "get_user_by_email built",
+            lambda: db.query(User).filter(User.email == "bench@example.com").first(),
+            calls,
+        )
+        measure(
+            "get_user_by_email cached",
+            lambda: db.scalars(
+                GET_USER_BY_EMAIL, {"email": "bench@example.com"}
+            ).first(),
+            calls,
+        )
+
+        db.close()
+        transaction.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Load test of admission control in front of a database-sized connection pool.
+
+Bursts of concurrent requests go through AdmissionControlMiddleware to a
+handler that behaves like the contact routes: it checks a connection out of
+a QueuePool sized by the same settings as the engine, blocking the event
+loop while it waits, runs a synchronous query and then awaits Redis while
+still holding the connection. Latencies are printed with and without
+admission control.
+
+Run from the project root with the usual .env:
+python -m scripts.load_admission [burst size ...]
+"""
+
+import asyncio
+import random
+import sys
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from starlette.responses import JSONResponse
+
+from src.conf.config import settings
+from src.services.admission import AdmissionControlMiddleware, overloaded_response
+
+QUERY_SECONDS = 0.002
+AWAIT_SECONDS = 0.02
+WRITE_SHARE = 0.2
+
+
+class Connection:
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def pool_app(pool: QueuePool):
+    async def app(scope, receive, send):
+        try:
+            connection = pool.connect()
+        except PoolTimeoutError:
+            response = overloaded_response()
+        else:
+            try:
+                time.sleep(QUERY_SECONDS)
+                await asyncio.sleep(AWAIT_SECONDS)
+            finally:
+                connection.close()
+            response = JSONResponse({})
+        await response(scope, receive, send)
+
+    return app
+
+
+def admission(app):
+    return AdmissionControlMiddleware(
+        app,
+        limits={
+            "auth": settings.admission_auth_limit,
+            "reads": settings.admission_read_limit,
+            "writes": settings.admission_write_limit,
+            "uploads": settings.admission_upload_limit,
+        },
+        queue_size=settings.admission_queue_size,
+        timeout=settings.admission_queue_timeout,
+    )
+
+
+async def request(app, method: str) -> tuple:
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": "/api/contacts/",
+        "query_string": b"",
+        "headers": [],
+    }
+    status = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    return status[0], time.perf_counter() - start
+
+
+def percentile(values: list, share: float) -> float:
+    return values[int(share * (len(values) - 1))] if values else 0.0
+
+
+async def burst(name: str, app, size: int) -> None:
+    rng = random.Random(size)
+    methods = ["POST" if rng.random() < WRITE_SHARE else "GET" for _ in range(size)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(request(app, method) for method in methods))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(seconds for _, seconds in results)
+    served = sum(1 for status, _ in results if status == 200)
+    print(
+        f"{name:18} {size:>5} requests in {elapsed:6.2f}s  "
+        f"served {served:>5}  503 {size - served:>5}  "
+        f"p50 {percentile(latencies, 0.5):6.3f}s  "
+        f"p99 {percentile(latencies, 0.99):6.3f}s  "
+        f"max {latencies[-1]:6.3f}s"
+    )
+
+
+def new_pool() -> QueuePool:
+    return QueuePool(
+        Connection,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        timeout=settings.db_pool_timeout,
+    )
+
+
+async def main() -> None:
+    sizes = [int(size) for size in sys.argv[1:]] or [50, 200, 1000]
+    for size in sizes:
+        await burst("admission control", admission(pool_app(new_pool())), size)
+    # without admission control every checkout from an empty pool blocks the
+    # event loop for db_pool_timeout, so only the smallest burst is compared
+    await burst("no admission", pool_app(new_pool()), min(sizes))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
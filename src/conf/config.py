@@ -21,6 +21,31 @@ class Settings(BaseSettings):
     postgres_user: str
     postgres_password: str
     postgres_port: int
+    stream_queue_size: int = 100
+    stream_heartbeat_seconds: float = 15
+    stats_reconcile_seconds: int = 3600
+    contacts_batch_max: int = 200
+    default_phone_country_code: str = "380"
+    audit_batch_size: int = 500
+    audit_buffer_size: int = 10000
+    audit_flush_seconds: float = 2
+    audit_fallback_dir: str = "audit_fallback"
+    audit_retention_months: int = 12
+    audit_partition_seconds: int = 3600
+    db_pool_size: int = 10
+    db_max_overflow: int = 5
+    # handlers use the session on the event loop, so a pool wait stalls the
+    # whole worker; fail fast and let admission control do the queueing
+    db_pool_timeout: float = 0.5
+    # the admission limits add up to one less than db_pool_size +
+    # db_max_overflow, the spare connection serves the background jobs
+    admission_auth_limit: int = 2
+    admission_read_limit: int = 8
+    admission_write_limit: int = 3
+    admission_upload_limit: int = 1
+    admission_queue_size: int = 50
+    admission_queue_timeout: float = 2
+    admission_retry_after: int = 1
 
     class Config:
         env_file = ".env"
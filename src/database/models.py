@@ -1,4 +1,15 @@
-from sqlalchemy import Column, Integer, String, Boolean, func, Table
+from sqlalchemy import (
+    Column,
+    Integer,
+    BigInteger,
+    String,
+    Boolean,
+    func,
+    Table,
+    Index,
+    Sequence,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.schema import ForeignKey
 from sqlalchemy.sql.sqltypes import DateTime
@@ -6,21 +17,60 @@ from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
+# shared by contacts and their tombstones, so every write gets a sync version
+contact_version_seq = Sequence("contact_version_seq", metadata=Base.metadata)
+
 
 class Contact(Base):
     __tablename__ = "contacts"
     id = Column(Integer, primary_key=True)
     firstname = Column(String(25), nullable=False)
     lastname = Column(String(25), nullable=False)
-    phone = Column(Integer)
+    phone = Column(String(16))
     email = Column(String(70), nullable=False)
     birthday = Column(DateTime, default=None)
     done = Column(Boolean, default=False)
+    tags = Column(ARRAY(String(30)), nullable=False, default=list, server_default="{}")
     user_id = Column(
         "user_id", ForeignKey("users.id", ondelete="CASCADE"), default=None
     )
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    version = Column(
+        BigInteger,
+        default=contact_version_seq.next_value(),
+        onupdate=contact_version_seq.next_value(),
+        nullable=False,
+    )
     user = relationship("User", backref="contacts")
 
+    __table_args__ = (
+        Index("ix_contacts_user_id_version", "user_id", "version"),
+        Index("ix_contacts_user_id_phone", "user_id", "phone"),
+        # needs btree_gin, so that tag filters stay within one user's contacts
+        Index("ix_contacts_user_id_tags", "user_id", "tags", postgresql_using="gin"),
+    )
+
+
+# Tombstones are never pruned: a client may sync with a token of any age, and
+# dropping old ones would hide deletes from it. They are removed with the user.
+class ContactTombstone(Base):
+    __tablename__ = "contact_tombstones"
+    id = Column(Integer, primary_key=True)
+    contact_id = Column(Integer, nullable=False)
+    user_id = Column(
+        "user_id", ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    version = Column(
+        BigInteger, default=contact_version_seq.next_value(), nullable=False
+    )
+    deleted_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        Index("ix_contact_tombstones_user_id_version", "user_id", "version"),
+    )
+    # the version is read right after the flush to publish the delete
+    __mapper_args__ = {"eager_defaults": True}
+
 
 class User(Base):
     __tablename__ = "users"
@@ -32,3 +82,20 @@ class User(Base):
     avatar = Column(String(255), nullable=True)
     refresh_token = Column(String(255), nullable=True)
     confirmed = Column(Boolean, default=False)
+
+
+class AuditEvent(Base):
+    __tablename__ = "audit_events"
+    id = Column(BigInteger, Sequence("audit_events_id_seq"), primary_key=True)
+    # the partition key has to be part of the primary key
+    created_at = Column(DateTime, primary_key=True)
+    user_id = Column(Integer)
+    action = Column(String(50), nullable=False)
+    entity = Column(String(20))
+    entity_id = Column(Integer)
+    details = Column(JSONB)
+
+    __table_args__ = (
+        Index("ix_audit_events_user_id_id", "user_id", "id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
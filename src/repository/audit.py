@@ -0,0 +1,68 @@
+from datetime import date, datetime
+from typing import List
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from src.database.models import AuditEvent, User
+
+
+async def get_events(
+    before: int | None, limit: int, user: User, db: Session
+) -> List[AuditEvent]:
+    # keyset pagination: the page starts below the last id the client has seen
+    query = db.query(AuditEvent).filter(AuditEvent.user_id == user.id)
+    if before is not None:
+        query = query.filter(AuditEvent.id < before)
+    return query.order_by(AuditEvent.id.desc()).limit(limit).all()
+
+
+# events are stamped with datetime.utcnow(), so partitions follow UTC months
+def _utc_today() -> date:
+    return datetime.utcnow().date()
+
+
+# serializes the partition DDL of all workers, concurrent CREATE TABLE ...
+# PARTITION OF statements can fail on the pg_type unique index; one-key
+# advisory locks never collide with the two-key ones of contact versions
+AUDIT_PARTITIONS_LOCK = 2
+LOCK_PARTITIONS = select(func.pg_advisory_xact_lock(AUDIT_PARTITIONS_LOCK))
+
+
+def _month(day: date, shift: int = 0) -> date:
+    months = day.year * 12 + day.month - 1 + shift
+    return date(months // 12, months % 12 + 1, 1)
+
+
+async def ensure_partitions(db: Session, ahead: int = 1) -> None:
+    db.execute(LOCK_PARTITIONS)
+    today = _utc_today()
+    for shift in range(ahead + 1):
+        start, end = _month(today, shift), _month(today, shift + 1)
+        db.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS audit_events_{start:%Y%m} "
+                f"PARTITION OF audit_events "
+                f"FOR VALUES FROM ('{start}') TO ('{end}')"
+            )
+        )
+    db.commit()
+
+
+async def drop_expired_partitions(db: Session, retention_months: int) -> List[str]:
+    # whole months are dropped at once instead of deleting rows one by one
+    db.execute(LOCK_PARTITIONS)
+    oldest = f"audit_events_{_month(_utc_today(), -retention_months):%Y%m}"
+    partitions = db.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = 'audit_events'"
+        )
+    ).scalars()
+    expired = [name for name in partitions if name < oldest]
+    for name in expired:
+        db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+    db.commit()
+    return expired
@@ -1,29 +1,180 @@
-from typing import List
-from sqlalchemy import and_, or_
+import asyncio
+from collections import Counter
+from functools import lru_cache
+from typing import List, Tuple
+from sqlalchemy import (
+    and_,
+    or_,
+    any_,
+    bindparam,
+    extract,
+    func,
+    literal,
+    not_,
+    select,
+    update,
+    Integer,
+    String,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import Session
 
-from src.database.models import Contact, User
+from src.database.models import Contact, ContactTombstone, User
 from src.schemas import *
+from src.services.audit import audit_log
+from src.services.duplicates import find_clusters
+from src.services.events import contact_events, contact_upserted, contact_deleted
+from src.services.stats import contact_stats, contact_counters
+from src.services.tags import MAX_TAGS_PER_CONTACT, TagFilter
 from datetime import datetime, timedelta
 
 
-# Show all contacts
-async def get_contacts(skip: int, limit: int, user: User, db: Session) -> List[Contact]:
+def _columns(fields: Tuple[str, ...] | None) -> list:
+    # a field set selects just those columns and returns rows instead of
+    # full Contact instances
+    if fields is None:
+        return [Contact]
+    return [getattr(Contact, name) for name in fields]
+
+
+# Hot statements are built once and only get new parameter values per call,
+# so SQLAlchemy serves their compiled SQL from its cache every time
+GET_CONTACT = select(Contact).where(
+    Contact.id == bindparam("contact_id"), Contact.user_id == bindparam("user_id")
+)
+
+GET_CONTACTS_BY_PHONE = select(Contact).where(
+    Contact.user_id == bindparam("user_id"), Contact.phone == bindparam("phone")
+)
+
+# first key of the two-key advisory lock, the user id is the second one
+CONTACT_VERSIONS_LOCK = 1
+LOCK_VERSIONS = select(
+    func.pg_advisory_xact_lock(CONTACT_VERSIONS_LOCK, bindparam("user_id"))
+)
+
+
+def _lock_versions(user: User, db: Session) -> None:
+    # Versions are drawn from a sequence at flush time, but clients read them
+    # in commit order. Holding a per-user lock from before the first draw
+    # until the commit makes a user's versions commit in the order they were
+    # drawn, so a sync token never skips over a version committed later.
+    # Writers take it before reading the rows they change, so they see the
+    # commits of the writer they waited for instead of a stale snapshot.
+    db.execute(LOCK_VERSIONS, {"user_id": user.id})
+
+
+def _tag_conditions(has_any: bool, has_all: bool) -> list:
+    # && and @> are the operators served by the GIN index on tags
+    conditions = []
+    if has_any:
+        conditions.append(
+            Contact.tags.overlap(bindparam("tags_any", type_=ARRAY(String)))
+        )
+    if has_all:
+        conditions.append(
+            Contact.tags.contains(bindparam("tags_all", type_=ARRAY(String)))
+        )
+    return conditions
+
+
+def _tag_params(tags: TagFilter | None) -> dict:
+    if tags is None:
+        return {}
+    return {"tags_any": list(tags.any_of), "tags_all": list(tags.all_of)}
+
+
+@lru_cache(maxsize=128)
+def _contacts_statement(
+    fields: Tuple[str, ...] | None, has_any: bool = False, has_all: bool = False
+):
     return (
-        db.query(Contact)
-        .filter(Contact.user_id == user.id)
-        .offset(skip)
-        .limit(limit)
-        .all()
+        select(*_columns(fields))
+        .where(
+            Contact.user_id == bindparam("user_id"),
+            *_tag_conditions(has_any, has_all),
+        )
+        .offset(bindparam("skip"))
+        .limit(bindparam("limit"))
     )
 
 
-async def get_contact(contact_id: int, user: User, db: Session) -> Contact:
+@lru_cache(maxsize=128)
+def _contacts_by_ids_statement(fields: Tuple[str, ...] | None):
+    # the whole list is bound as one array parameter, so the SQL text stays
+    # the same whatever the number of ids
+    return select(*_columns(fields)).where(
+        Contact.user_id == bindparam("user_id"),
+        Contact.id == any_(bindparam("ids", type_=ARRAY(Integer))),
+    )
+
+
+@lru_cache(maxsize=128)
+def _search_statement(
+    fields: Tuple[str, ...] | None, has_any: bool = False, has_all: bool = False
+):
+    search_word = bindparam("search_word")
     return (
-        db.query(Contact)
-        .filter(and_(Contact.id == contact_id, Contact.user_id == user.id))
-        .first()
+        select(*_columns(fields))
+        .where(
+            Contact.user_id == bindparam("user_id"),
+            *_tag_conditions(has_any, has_all),
+            or_(
+                Contact.firstname == search_word,
+                Contact.lastname == search_word,
+                Contact.email == search_word,
+            ),
+        )
+        .limit(1)
+    )
+
+
+def _execute(statement, params: dict, fields: Tuple[str, ...] | None, db: Session):
+    result = db.execute(statement, params)
+    return result.scalars() if fields is None else result
+
+
+# Show all contacts
+async def get_contacts(
+    skip: int,
+    limit: int,
+    user: User,
+    db: Session,
+    fields: Tuple[str, ...] | None = None,
+    tags: TagFilter | None = None,
+) -> List[Contact]:
+    params = {"user_id": user.id, "skip": skip, "limit": limit, **_tag_params(tags)}
+    statement = _contacts_statement(
+        fields, bool(tags and tags.any_of), bool(tags and tags.all_of)
     )
+    return _execute(statement, params, fields, db).all()
+
+
+async def get_contact(contact_id: int, user: User, db: Session) -> Contact:
+    params = {"contact_id": contact_id, "user_id": user.id}
+    return db.scalars(GET_CONTACT, params).first()
+
+
+async def get_contacts_by_ids(
+    ids: List[int], user: User, db: Session, fields: Tuple[str, ...] | None = None
+) -> dict:
+    ids = list(dict.fromkeys(ids))
+    params = {"user_id": user.id, "ids": ids}
+    found = {
+        contact.id: contact
+        for contact in _execute(
+            _contacts_by_ids_statement(fields), params, fields, db
+        ).all()
+    }
+    return {
+        "contacts": [found[i] for i in ids if i in found],
+        "missing": [i for i in ids if i not in found],
+    }
+
+
+async def get_contacts_by_phone(phone: str, user: User, db: Session) -> List[Contact]:
+    params = {"user_id": user.id, "phone": phone}
+    return db.scalars(GET_CONTACTS_BY_PHONE, params).all()
 
 
 async def create_contact(body: ContactModel, user: User, db: Session) -> Contact:
@@ -33,42 +184,63 @@ async def create_contact(body: ContactModel, user: User, db: Session) -> Contact
         email=body.email,
         phone=body.phone,
         birthday=body.birthday,
+        tags=body.tags,
         user=user,
     )
+    _lock_versions(user, db)
     db.add(contact)
     db.commit()
     db.refresh(contact)
+    await contact_stats.apply(user.id, Counter(), contact_counters(contact))
+    audit_log.emit(user.id, "contact_created", "contact", contact.id)
+    await contact_events.publish(user.id, contact_upserted(contact))
     return contact
 
 
 async def remove_contact(contact_id: int, user: User, db: Session) -> Contact | None:
-    contact = (
-        db.query(Contact)
-        .filter(and_(Contact.id == contact_id, Contact.user_id == user.id))
-        .first()
-    )
+    params = {"contact_id": contact_id, "user_id": user.id}
+    _lock_versions(user, db)
+    contact = db.scalars(GET_CONTACT, params).first()
     if contact:
-        db.delete(contact)
+        tombstone = _delete_contact(contact, db)
+        db.flush()
+        event = contact_deleted(tombstone)
         db.commit()
+        await contact_stats.apply(user.id, contact_counters(contact), Counter())
+        audit_log.emit(user.id, "contact_deleted", "contact", contact_id)
+        await contact_events.publish(user.id, event)
     return contact
 
 
+def _delete_contact(contact: Contact, db: Session) -> ContactTombstone:
+    # leave a tombstone behind so that syncing clients learn about the delete
+    tombstone = ContactTombstone(contact_id=contact.id, user_id=contact.user_id)
+    db.add(tombstone)
+    db.delete(contact)
+    return tombstone
+
+
 async def update_contact(
     contact_id: int, body: ContactUpdate, user: User, db: Session
 ) -> Contact | None:
-    contact = (
-        db.query(Contact)
-        .filter(and_(Contact.id == contact_id, Contact.user_id == user.id))
-        .first()
-    )
+    params = {"contact_id": contact_id, "user_id": user.id}
+    _lock_versions(user, db)
+    contact = db.scalars(GET_CONTACT, params).first()
     if contact:
-        contact.firstname = (body.firstname,)
-        contact.lastname = (body.lastname,)
-        contact.email = (body.email,)
-        contact.phone = (body.phone,)
-        contact.birthday = (body.birthday,)
+        before = contact_counters(contact)
+        contact.firstname = body.firstname
+        contact.lastname = body.lastname
+        contact.email = body.email
+        contact.phone = body.phone
+        contact.birthday = body.birthday
+        if body.tags is not None:
+            contact.tags = body.tags
         contact.done = body.done
+        after = contact_counters(contact)
         db.commit()
+        await contact_stats.apply(user.id, before, after)
+        audit_log.emit(user.id, "contact_updated", "contact", contact_id)
+        await contact_events.publish(user.id, contact_upserted(contact))
     return contact
 
 
@@ -82,19 +254,252 @@ async def get_birthdays(user: User, db: Session) -> Contact | None:
     return contacts
 
 
-async def get_search_contacts(search_word, user: User, db: Session) -> Contact | None:
-    contact = (
-        db.query(Contact)
+async def get_search_contacts(
+    search_word,
+    user: User,
+    db: Session,
+    fields: Tuple[str, ...] | None = None,
+    tags: TagFilter | None = None,
+) -> Contact | None:
+    params = {"user_id": user.id, "search_word": search_word, **_tag_params(tags)}
+    statement = _search_statement(
+        fields, bool(tags and tags.any_of), bool(tags and tags.all_of)
+    )
+    return _execute(statement, params, fields, db).first()
+
+
+def _without_tags(tags: List[str]):
+    expression = Contact.tags
+    for tag in tags:
+        expression = func.array_remove(expression, tag, type_=Contact.tags.type)
+    return expression
+
+
+async def _update_tags(
+    action: str, body: ContactTags, condition, expression, user: User, db: Session
+) -> List[Contact]:
+    statement = (
+        update(Contact)
+        .where(
+            Contact.user_id == user.id,
+            Contact.id == any_(literal(body.ids, ARRAY(Integer))),
+            condition,
+        )
+        .values(tags=expression)
+        .returning(Contact)
+        .execution_options(synchronize_session=False)
+    )
+    _lock_versions(user, db)
+    contacts = db.scalars(statement).all()
+    events = [contact_upserted(contact) for contact in contacts]
+    ids = [contact.id for contact in contacts]
+    for contact in contacts:
+        # detached rows keep the RETURNING values instead of expiring on
+        # commit, which would reload every contact with its own SELECT
+        db.expunge(contact)
+    db.commit()
+    audit_log.emit(user.id, action, "contact", None, {"ids": ids, "tags": body.tags})
+    await contact_events.publish(user.id, *events)
+    return contacts
+
+
+async def add_tags(body: ContactTags, user: User, db: Session) -> List[Contact]:
+    """Adds tags to the given contacts of the user.
+
+    Raises ValueError, and changes nothing, when a contact would end up with
+    more than MAX_TAGS_PER_CONTACT tags.
+    """
+    tags = literal(body.tags, Contact.tags.type)
+    # removing first keeps every tag once, contacts that have them all are skipped
+    expression = func.array_cat(_without_tags(body.tags), tags, type_=Contact.tags.type)
+    # every tag write of the user waits for this lock, so the counts checked
+    # here still hold when the update runs
+    _lock_versions(user, db)
+    over_limit = db.scalars(
+        select(Contact.id).where(
+            Contact.user_id == user.id,
+            Contact.id == any_(literal(body.ids, ARRAY(Integer))),
+            func.cardinality(expression) > MAX_TAGS_PER_CONTACT,
+        )
+    ).all()
+    if over_limit:
+        db.rollback()
+        raise ValueError(
+            f"Contacts can have no more than {MAX_TAGS_PER_CONTACT} tags, "
+            f"too many for: {', '.join(map(str, over_limit))}"
+        )
+    return await _update_tags(
+        "contact_tags_added",
+        body,
+        not_(Contact.tags.contains(tags)),
+        expression,
+        user,
+        db,
+    )
+
+
+async def remove_tags(body: ContactTags, user: User, db: Session) -> List[Contact]:
+    tags = literal(body.tags, Contact.tags.type)
+    return await _update_tags(
+        "contact_tags_removed",
+        body,
+        Contact.tags.overlap(tags),
+        _without_tags(body.tags),
+        user,
+        db,
+    )
+
+
+async def get_duplicates(user: User, db: Session) -> List[dict]:
+    rows = db.query(
+        Contact.id, Contact.firstname, Contact.lastname, Contact.email, Contact.phone
+    ).filter(Contact.user_id == user.id)
+    clusters = find_clusters(rows)
+    ids = [contact_id for cluster_ids, _ in clusters for contact_id in cluster_ids]
+    contacts = {
+        contact.id: contact
+        for contact in db.query(Contact)
+        .filter(and_(Contact.user_id == user.id, Contact.id.in_(ids)))
+        .all()
+    }
+    return [
+        {"keys": keys, "contacts": [contacts[contact_id] for contact_id in cluster_ids]}
+        for cluster_ids, keys in clusters
+    ]
+
+
+async def merge_contacts(body: ContactMerge, user: User, db: Session) -> Contact | None:
+    duplicate_ids = [
+        i for i in dict.fromkeys(body.duplicate_ids) if i != body.primary_id
+    ]
+    _lock_versions(user, db)
+    contacts = {
+        contact.id: contact
+        for contact in db.query(Contact)
         .filter(
             and_(
                 Contact.user_id == user.id,
-                or_(
-                    Contact.firstname == search_word,
-                    Contact.lastname == search_word,
-                    Contact.email == search_word,
-                ),
+                Contact.id.in_([body.primary_id, *duplicate_ids]),
             )
         )
-        .first()
+        .all()
+    }
+    primary = contacts.pop(body.primary_id, None)
+    if primary is None:
+        return None
+    before = contact_counters(primary)
+    tombstones = []
+    for duplicate in contacts.values():
+        before.update(contact_counters(duplicate))
+        # the primary contact wins, duplicates only fill the gaps
+        if primary.phone is None:
+            primary.phone = duplicate.phone
+        if primary.birthday is None:
+            primary.birthday = duplicate.birthday
+        primary.done = bool(primary.done or duplicate.done)
+        tags = list(dict.fromkeys(primary.tags + duplicate.tags))
+        primary.tags = tags[:MAX_TAGS_PER_CONTACT]
+        tombstones.append(_delete_contact(duplicate, db))
+    after = contact_counters(primary)
+    db.flush()
+    events = [contact_deleted(tombstone) for tombstone in tombstones]
+    db.commit()
+    db.refresh(primary)
+    await contact_stats.apply(user.id, before, after)
+    audit_log.emit(
+        user.id,
+        "contacts_merged",
+        "contact",
+        primary.id,
+        {"duplicate_ids": [tombstone.contact_id for tombstone in tombstones]},
     )
-    return contact
+    await contact_events.publish(user.id, contact_upserted(primary), *events)
+    return primary
+
+
+async def get_changes(since: int, limit: int, user: User, db: Session) -> dict:
+    # tombstones are never pruned, so any old token still sees every delete
+    # one extra row from each side tells whether another page is waiting
+    changed = (
+        db.query(Contact)
+        .filter(and_(Contact.user_id == user.id, Contact.version > since))
+        .order_by(Contact.version)
+        .limit(limit + 1)
+        .all()
+    )
+    deleted = (
+        db.query(ContactTombstone)
+        .filter(
+            and_(ContactTombstone.user_id == user.id, ContactTombstone.version > since)
+        )
+        .order_by(ContactTombstone.version)
+        .limit(limit + 1)
+        .all()
+    )
+    events = sorted(changed + deleted, key=lambda item: item.version)
+    page = events[:limit]
+    return {
+        "changed": [item for item in page if isinstance(item, Contact)],
+        "deleted": [
+            item.contact_id for item in page if isinstance(item, ContactTombstone)
+        ],
+        "token": page[-1].version if page else since,
+        "has_more": len(events) > limit,
+    }
+
+
+def _count_stats(user_ids: List[int], db: Session) -> dict:
+    month = extract("month", Contact.birthday)
+    rows = (
+        db.query(
+            Contact.user_id,
+            month,
+            func.count(Contact.id),
+            func.count(Contact.id).filter(Contact.done.is_(True)),
+        )
+        .filter(Contact.user_id.in_(user_ids))
+        .group_by(Contact.user_id, month)
+        .all()
+    )
+    stats = {user_id: Counter(total=0, done=0) for user_id in user_ids}
+    for user_id, birthday_month, total, done in rows:
+        stats[user_id]["total"] += total
+        stats[user_id]["done"] += done
+        if birthday_month is not None:
+            stats[user_id][f"birthday:{int(birthday_month)}"] += total
+    return stats
+
+
+async def get_stats(user: User, db: Session) -> dict:
+    counters = await contact_stats.get(user.id)
+    if counters is None:
+        counters = _count_stats([user.id], db)[user.id]
+        await contact_stats.store(user.id, counters, {})
+    month = datetime.now().month
+    return {
+        "total": counters.get("total", 0),
+        "done": counters.get("done", 0),
+        "not_done": counters.get("total", 0) - counters.get("done", 0),
+        "birthdays_this_month": counters.get(f"birthday:{month}", 0),
+    }
+
+
+async def reconcile_stats(db: Session, batch_size: int = 500) -> None:
+    # recount every cached user so that lost increments do not live forever
+    batch = []
+    async for user_id in contact_stats.cached_users():
+        batch.append(user_id)
+        if len(batch) == batch_size:
+            await _store_stats(batch, db)
+            batch = []
+    if batch:
+        await _store_stats(batch, db)
+
+
+async def _store_stats(user_ids: List[int], db: Session) -> None:
+    # read before counting, so that a hash moved in the meantime is left alone
+    cached = await contact_stats.get_many(user_ids)
+    # the scan over all contacts of the batch must not stall the event loop
+    counted = await asyncio.to_thread(_count_stats, user_ids, db)
+    for user_id, counters in counted.items():
+        await contact_stats.store(user_id, counters, cached[user_id])
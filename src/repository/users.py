@@ -1,12 +1,17 @@
 from libgravatar import Gravatar
+from sqlalchemy import bindparam, select
 from sqlalchemy.orm import Session
 
 from src.database.models import User
 from src.schemas import UserModel
+from src.services.audit import audit_log
+
+# built once, every lookup only binds a new email (see repository.contacts)
+GET_USER_BY_EMAIL = select(User).where(User.email == bindparam("email"))
 
 
 async def get_user_by_email(email: str, db: Session) -> User:
-    return db.query(User).filter(User.email == email).first()
+    return db.scalars(GET_USER_BY_EMAIL, {"email": email}).first()
 
 
 async def create_user(body: UserModel, db: Session) -> User:
@@ -20,22 +25,29 @@ async def create_user(body: UserModel, db: Session) -> User:
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    audit_log.emit(new_user.id, "user_created", "user", new_user.id)
     return new_user
 
 
-async def update_token(user: User, token: str | None, db: Session) -> None:
+async def update_token(
+    user: User, token: str | None, db: Session, action: str | None = None
+) -> None:
     user.refresh_token = token
     db.commit()
+    action = action or ("token_issued" if token else "token_revoked")
+    audit_log.emit(user.id, action, "user", user.id)
 
 
 async def confirmed_email(email: str, db: Session) -> None:
     user = await get_user_by_email(email, db)
     user.confirmed = True
     db.commit()
+    audit_log.emit(user.id, "email_confirmed", "user", user.id)
 
 
 async def update_avatar(email, url: str, db: Session) -> User:
     user = await get_user_by_email(email, db)
     user.avatar = url
     db.commit()
+    audit_log.emit(user.id, "avatar_updated", "user", user.id)
     return user
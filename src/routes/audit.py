@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from src.database.db import get_db
+from src.database.models import User
+from src.repository import audit as repository_audit
+from src.schemas import AuditPage
+from src.services.auth import auth_service
+
+router = APIRouter(prefix="/audit", tags=["audit"])
+
+
+@router.get("/", response_model=AuditPage)
+async def read_events(
+    before: int | None = Query(None, description="Return events older than this id"),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    events = await repository_audit.get_events(before, limit, current_user, db)
+    return {
+        "events": events,
+        "next_before": events[-1].id if len(events) == limit else None,
+    }
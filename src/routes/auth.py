@@ -69,7 +69,7 @@ async def login(
     # Generate JWT
     access_token = await auth_service.create_access_token(data={"sub": user.email})
     refresh_token = await auth_service.create_refresh_token(data={"sub": user.email})
-    await repository_users.update_token(user, refresh_token, db)
+    await repository_users.update_token(user, refresh_token, db, "login")
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
@@ -93,7 +93,7 @@ async def refresh_token(
 
     access_token = await auth_service.create_access_token(data={"sub": email})
     refresh_token = await auth_service.create_refresh_token(data={"sub": email})
-    await repository_users.update_token(user, refresh_token, db)
+    await repository_users.update_token(user, refresh_token, db, "refresh")
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
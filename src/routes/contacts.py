@@ -1,12 +1,23 @@
-from typing import List
+from typing import List, Tuple
 
 from fastapi import APIRouter, HTTPException, Depends, status, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from src.database.models import User
 from src.database.db import get_db
 from src.schemas import *
 from src.repository import contacts as repository_contacts
+from src.services.events import contact_events
+from src.services.fields import (
+    contact_fields,
+    contact_fields_model,
+    contacts_response,
+    dump_contacts,
+)
 from src.services.auth import auth_service
+from src.services.phones import normalize_phone
+from src.services.tags import TagFilter, tag_filter
+from src.conf.config import settings
 from fastapi_limiter.depends import RateLimiter
 
 router = APIRouter(prefix="/contacts", tags=["contacts"])
@@ -21,13 +32,143 @@ router = APIRouter(prefix="/contacts", tags=["contacts"])
 async def read_contacts(
     skip: int = 0,
     limit: int = 100,
+    fields: Tuple[str, ...] | None = Depends(contact_fields),
+    tags: TagFilter | None = Depends(tag_filter),
     current_user: User = Depends(auth_service.get_current_user),
     db: Session = Depends(get_db),
 ):
-    contacts = await repository_contacts.get_contacts(skip, limit, current_user, db)
+    contacts = await repository_contacts.get_contacts(
+        skip, limit, current_user, db, fields, tags
+    )
+    if fields is not None:
+        return contacts_response(contacts, fields)
     return contacts
 
 
+async def get_batch(
+    ids: List[int], fields: Tuple[str, ...] | None, user: User, db: Session
+):
+    if len(ids) > settings.contacts_batch_max:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"No more than {settings.contacts_batch_max} ids per request",
+        )
+    batch = await repository_contacts.get_contacts_by_ids(ids, user, db, fields)
+    if fields is not None:
+        batch["contacts"] = dump_contacts(batch["contacts"], fields)
+        return JSONResponse(batch)
+    return batch
+
+
+@router.get("/batch", response_model=ContactBatch)
+async def read_contacts_batch(
+    ids: List[int] = Query(),
+    fields: Tuple[str, ...] | None = Depends(contact_fields),
+    current_user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    return await get_batch(ids, fields, current_user, db)
+
+
+@router.post("/batch", response_model=ContactBatch)
+async def read_contacts_batch_post(
+    body: ContactBatchRequest,
+    fields: Tuple[str, ...] | None = Depends(contact_fields),
+    current_user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    return await get_batch(body.ids, fields, current_user, db)
+
+
+@router.get("/by-phone", response_model=List[ContactResponse])
+async def read_contacts_by_phone(
+    number: str = Query(),
+    current_user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    try:
+        phone = normalize_phone(number)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return await repository_contacts.get_contacts_by_phone(phone, current_user, db)
+
+
+@router.post("/tags/add", response_model=List[ContactResponse])
+async def add_tags(
+    body: ContactTags,
+    current_user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    try:
+        return await repository_contacts.add_tags(body, current_user, db)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.post("/tags/remove", response_model=List[ContactResponse])
+async def remove_tags(
+    body: ContactTags,
+    current_user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    return await repository_contacts.remove_tags(body, current_user, db)
+
+
+@router.get("/duplicates", response_model=List[ContactDuplicates])
+async def read_duplicates(
+    current_user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    return await repository_contacts.get_duplicates(current_user, db)
+
+
+@router.post("/merge", response_model=ContactResponse)
+async def merge_contacts(
+    body: ContactMerge,
+    current_user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    contact = await repository_contacts.merge_contacts(body, current_user, db)
+    if contact is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found"
+        )
+    return contact
+
+
+@router.get("/changes", response_model=ContactChanges)
+async def read_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=1000),
+    current_user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    return await repository_contacts.get_changes(since, limit, current_user, db)
+
+
+@router.get("/stats", response_model=ContactStats)
+async def read_stats(
+    current_user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    return await repository_contacts.get_stats(current_user, db)
+
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_changes(
+    current_user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    # the session used to authenticate would otherwise keep its pooled
+    # connection checked out for the whole lifetime of the stream
+    db.close()
+    return StreamingResponse(
+        contact_events.stream(current_user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/{contact_id}", response_model=ContactResponse)
 async def read_contact(
     contact_id: int,
@@ -63,7 +204,9 @@ async def update_contact(
     current_user: User = Depends(auth_service.get_current_user),
     db: Session = Depends(get_db),
 ):
-    contact = await repository_contacts.update_contact(contact_id, body, user, db)
+    contact = await repository_contacts.update_contact(
+        contact_id, body, current_user, db
+    )
     if contact is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found"
@@ -97,10 +240,17 @@ async def get_birthdays(
 @router.get("/searching/", response_model=ContactResponse)
 async def get_search_contacts(
     search_word: str = Query,
+    fields: Tuple[str, ...] | None = Depends(contact_fields),
+    tags: TagFilter | None = Depends(tag_filter),
     current_user: User = Depends(auth_service.get_current_user),
     db: Session = Depends(get_db),
 ):
     search_contacts = await repository_contacts.get_search_contacts(
-        search_word, current_user, db
+        search_word, current_user, db, fields, tags
     )
+    if fields is not None and search_contacts is not None:
+        model = contact_fields_model(fields)
+        return JSONResponse(
+            model.model_validate(search_contacts).model_dump(mode="json")
+        )
     return search_contacts
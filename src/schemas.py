@@ -2,20 +2,43 @@ from datetime import datetime, date
 from typing import List, Optional
 from pydantic import *
 
+from src.services.phones import normalize_phone
+from src.services.tags import MAX_TAGS_PER_CONTACT, normalize_tags
+
 
 class ContactBase(BaseModel):
     firstname: str = Field(max_length=25)
     lastname: str = Field(max_length=25)
     email: EmailStr = Field(max_length=100)
-    phone: int = Field()
+    phone: str = Field(max_length=16)
+    tags: List[str] = Field(default_factory=list)
 
 
 class ContactModel(ContactBase):
+    # limited on input only, a response must never fail on a stored contact
+    tags: List[str] = Field(default_factory=list, max_length=MAX_TAGS_PER_CONTACT)
     birthday: date = Field(None, description="The birthday date Day-Month-Year")
 
+    @field_validator("phone", mode="before")
+    @classmethod
+    def phone_to_e164(cls, value):
+        # stored in E.164 form, so lookups compare plain strings
+        return normalize_phone(value)
+
+    @field_validator("tags")
+    @classmethod
+    def tags_normalized(cls, value):
+        return normalize_tags(value) if value is not None else None
+
 
 class ContactUpdate(ContactModel):  # updates the whole contact
     done: bool
+    # optional, so that clients unaware of tags do not wipe them on update
+    tags: Optional[List[str]] = Field(
+        None,
+        max_length=MAX_TAGS_PER_CONTACT,
+        description="Leave out to keep the current tags",
+    )
 
 
 class ContactResponse(ContactBase):
@@ -25,6 +48,70 @@ class ContactResponse(ContactBase):
         from_attributes = True
 
 
+class ContactDuplicates(BaseModel):
+    keys: List[str]
+    contacts: List[ContactResponse]
+
+
+class ContactMerge(BaseModel):
+    primary_id: int
+    duplicate_ids: List[int] = Field(min_length=1)
+
+
+class ContactBatchRequest(BaseModel):
+    ids: List[int] = Field(min_length=1)
+
+
+class ContactBatch(BaseModel):
+    contacts: List[ContactResponse]
+    missing: List[int]
+
+
+class ContactTags(BaseModel):
+    ids: List[int] = Field(min_length=1)
+    tags: List[str] = Field(min_length=1, max_length=MAX_TAGS_PER_CONTACT)
+
+    @field_validator("tags")
+    @classmethod
+    def tags_normalized(cls, value):
+        return normalize_tags(value) if value is not None else None
+
+
+class ContactChanges(BaseModel):
+    changed: List[ContactResponse]
+    deleted: List[int]
+    token: int = Field(
+        description="Pass as `since` to receive the next changes, tokens never expire"
+    )
+    has_more: bool
+
+
+class ContactStats(BaseModel):
+    total: int
+    done: int
+    not_done: int
+    birthdays_this_month: int
+
+
+class AuditEventResponse(BaseModel):
+    id: int
+    created_at: datetime
+    action: str
+    entity: Optional[str]
+    entity_id: Optional[int]
+    details: Optional[dict]
+
+    class Config:
+        from_attributes = True
+
+
+class AuditPage(BaseModel):
+    events: List[AuditEventResponse]
+    next_before: Optional[int] = Field(
+        description="Pass as `before` to get the next page"
+    )
+
+
 class UserModel(BaseModel):
     username: str = Field(min_length=5, max_length=16)
     email: EmailStr = Field(max_length=100)
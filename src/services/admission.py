@@ -0,0 +1,94 @@
+import asyncio
+from typing import Dict, Iterable
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src.conf.config import settings
+
+
+def overloaded_response() -> JSONResponse:
+    return JSONResponse(
+        {"detail": "Service is overloaded, try again later"},
+        status_code=503,
+        headers={"Retry-After": str(settings.admission_retry_after)},
+    )
+
+
+class ConcurrencyLimit:
+    """A semaphore with a bounded number of waiters and a wait deadline."""
+
+    def __init__(self, limit: int, queue_size: int, timeout: float):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.waiting = 0
+
+    async def acquire(self) -> bool:
+        if not self.semaphore.locked():
+            await self.semaphore.acquire()
+            return True
+        if self.waiting >= self.queue_size:
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+
+    def release(self) -> None:
+        self.semaphore.release()
+
+
+def route_class(scope: Scope) -> str:
+    path = scope["path"]
+    if path.startswith("/api/auth"):
+        return "auth"
+    if path == "/api/users/avatar":
+        return "uploads"
+    if scope["method"] in ("GET", "HEAD", "OPTIONS"):
+        return "reads"
+    return "writes"
+
+
+class AdmissionControlMiddleware:
+    """Limits concurrent requests per route class and sheds the overflow.
+
+    Requests over the limit wait in a bounded queue until a slot frees up or
+    the deadline passes; when the queue is full they are rejected with 503
+    straight away instead of piling up in front of the database pool.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limits: Dict[str, int],
+        queue_size: int,
+        timeout: float,
+        exempt: Iterable[str] = (),
+    ):
+        self.app = app
+        self.limits = {
+            name: ConcurrencyLimit(limit, queue_size, timeout)
+            for name, limit in limits.items()
+        }
+        self.exempt = set(exempt)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exempt:
+            await self.app(scope, receive, send)
+            return
+        limit = self.limits.get(route_class(scope))
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        if not await limit.acquire():
+            await overloaded_response()(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release()
@@ -0,0 +1,257 @@
+import asyncio
+import fcntl
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from src.conf.config import settings
+from src.database.db import SessionLocal
+from src.database.models import AuditEvent
+
+# errors caused by the rows themselves, retrying them can never succeed
+DATA_ERRORS = (DataError, IntegrityError)
+
+
+class AuditLog:
+    """Buffers audit events in memory and writes them to Postgres in batches.
+
+    emit() only appends to a bounded deque; a background task inserts the
+    buffer as multi-row batches when it fills up or every few seconds.
+    Batches that cannot be written, and events arriving while the buffer is
+    full, are moved to an overflow deque that the background task writes, in
+    a thread, to a per-process append-only file in settings.audit_fallback_dir
+    that is replayed once the database accepts writes again. Events arriving
+    while the overflow is full as well are dropped and counted. Each process
+    keeps its current file locked; a file nobody holds, left behind by a dead
+    worker or rotated aside for replay, is replayed by whichever worker
+    locks it first.
+    """
+
+    def __init__(self):
+        self.buffer: deque = deque()
+        self.overflow: deque = deque()
+        self.dropped = 0
+        self.full = asyncio.Event()
+        self.writer: asyncio.Task | None = None
+        self.file_lock = threading.Lock()
+        self.fallback = None
+
+    def emit(
+        self,
+        user_id: int | None,
+        action: str,
+        entity: str | None = None,
+        entity_id: int | None = None,
+        details: dict | None = None,
+    ) -> None:
+        event = {
+            "created_at": datetime.utcnow(),
+            "user_id": user_id,
+            "action": action,
+            "entity": entity,
+            "entity_id": entity_id,
+            "details": details,
+        }
+        if len(self.buffer) >= settings.audit_buffer_size:
+            # the writer moves it to the fallback file, emit() never waits
+            # for the disk
+            if len(self.overflow) >= settings.audit_buffer_size:
+                self.dropped += 1
+            else:
+                self.overflow.append(event)
+            self.full.set()
+            return
+        self.buffer.append(event)
+        if len(self.buffer) >= settings.audit_batch_size:
+            self.full.set()
+
+    async def start(self) -> None:
+        Path(settings.audit_fallback_dir).mkdir(parents=True, exist_ok=True)
+        self.fallback = self._open_fallback()
+        self.writer = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.cancel()
+            self.writer = None
+        await self.flush()
+        await self._drain_overflow()
+        with self.file_lock:
+            if self.fallback is not None:
+                self.fallback.close()
+                self.fallback = None
+
+    async def flush(self) -> bool:
+        while self.buffer:
+            size = min(len(self.buffer), settings.audit_batch_size)
+            batch = [self.buffer.popleft() for _ in range(size)]
+            try:
+                await asyncio.to_thread(self._insert, batch)
+            except Exception as e:
+                print(e)
+                self.overflow.extend(batch)
+                self.overflow.extend(self.buffer)
+                self.buffer.clear()
+                await self._drain_overflow()
+                return False
+        return True
+
+    async def _run(self) -> None:
+        await asyncio.to_thread(self._replay)
+        while True:
+            try:
+                await asyncio.wait_for(self.full.wait(), settings.audit_flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self.full.clear()
+            await self._drain_overflow()
+            if await self.flush():
+                await asyncio.to_thread(self._replay)
+
+    def _insert(self, batch: List[dict]) -> None:
+        with SessionLocal() as db:
+            db.execute(insert(AuditEvent), batch)
+            db.commit()
+
+    def _insert_valid(self, batch: List[dict]) -> List[dict]:
+        """Inserts a batch in one transaction, leaving out the rows Postgres rejects.
+
+        Returns the rejected rows. Connection errors are raised and nothing
+        of the batch is committed.
+        """
+        with SessionLocal() as db:
+            try:
+                db.execute(insert(AuditEvent), batch)
+                db.commit()
+                return []
+            except DATA_ERRORS:
+                db.rollback()
+            # find the offending rows one by one, each behind a savepoint
+            rejected = []
+            for event in batch:
+                try:
+                    with db.begin_nested():
+                        db.execute(insert(AuditEvent), [event])
+                except DATA_ERRORS:
+                    rejected.append(event)
+            db.commit()
+            return rejected
+
+    def _open_fallback(self):
+        path = Path(settings.audit_fallback_dir) / f"audit-{os.getpid()}.jsonl"
+        fallback = open(path, "a")
+        fcntl.flock(fallback, fcntl.LOCK_EX)
+        return fallback
+
+    async def _drain_overflow(self) -> None:
+        if self.dropped:
+            print(f"Audit events dropped, the overflow was full: {self.dropped}")
+            self.dropped = 0
+        if self.overflow:
+            await asyncio.to_thread(self._spill_overflow)
+
+    def _spill_overflow(self) -> None:
+        # emit() keeps appending on the event loop, so only what is there now
+        # is taken; a spill still running in a thread of the cancelled writer
+        # may take some of it first
+        events = []
+        for _ in range(len(self.overflow)):
+            try:
+                events.append(self.overflow.popleft())
+            except IndexError:
+                break
+        self._spill(events)
+
+    def _spill(self, events: List[dict]) -> None:
+        if self.fallback is None:
+            return
+        lines = "".join(json.dumps(event, default=str) + "\n" for event in events)
+        with self.file_lock:
+            self.fallback.write(lines)
+            self.fallback.flush()
+            os.fsync(self.fallback.fileno())
+
+    def _rotate(self) -> None:
+        # The own file is renamed aside and replayed like the files of dead
+        # workers, so new spills never wait for a replay to finish
+        with self.file_lock:
+            if self.fallback is None or self.fallback.tell() == 0:
+                return
+            path = Path(self.fallback.name)
+            path.rename(path.with_name(f"audit-{os.getpid()}-{time.time_ns()}.jsonl"))
+            previous, self.fallback = self.fallback, self._open_fallback()
+            previous.close()
+
+    def _replay(self) -> None:
+        self._rotate()
+        for path in Path(settings.audit_fallback_dir).glob("audit-*.jsonl"):
+            try:
+                file = open(path, "r+")
+            except FileNotFoundError:
+                # replayed and removed by another worker in the meantime
+                continue
+            with file:
+                try:
+                    fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # a live worker's current file, or replayed by another one
+                    continue
+                if self._replay_file(file):
+                    path.unlink()
+
+    def _replay_file(self, file) -> bool:
+        """Inserts the events of a fallback file batch by batch.
+
+        After every committed batch the file is rewritten with the lines still
+        pending, so a later failure never makes the next replay insert the same
+        events twice. Rows Postgres rejects for their data, e.g. for a month
+        whose partition was already dropped, go to a quarantine file instead of
+        blocking the file forever. Returns whether the file was drained.
+        """
+        pending = file.readlines()
+        while pending:
+            lines = pending[: settings.audit_batch_size]
+            events = []
+            for line in lines:
+                try:
+                    event = json.loads(line)
+                    event["created_at"] = datetime.fromisoformat(event["created_at"])
+                except (ValueError, KeyError, TypeError):
+                    # a line torn by a crash in the middle of a write
+                    continue
+                events.append(event)
+            try:
+                rejected = self._insert_valid(events) if events else []
+            except Exception as e:
+                print(e)
+                return False
+            if rejected:
+                self._quarantine(rejected)
+            pending = pending[len(lines) :]
+            # written over the start and only then cut, a crash in between
+            # leaves duplicated lines behind rather than losing any
+            file.seek(0)
+            file.writelines(pending)
+            file.truncate()
+            file.flush()
+            os.fsync(file.fileno())
+        return True
+
+    def _quarantine(self, events: List[dict]) -> None:
+        print(f"Audit events rejected by the database: {len(events)}")
+        path = Path(settings.audit_fallback_dir) / f"rejected-{os.getpid()}.jsonl"
+        with open(path, "a") as file:
+            file.write("".join(json.dumps(e, default=str) + "\n" for e in events))
+            file.flush()
+            os.fsync(file.fileno())
+
+
+audit_log = AuditLog()
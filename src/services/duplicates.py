@@ -0,0 +1,206 @@
+import re
+import string
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+SOUNDEX_CODES = {
+    **dict.fromkeys("aeiouy", "0"),
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+# byte tables, so a whole column of names is coded by single C-level calls:
+# letters become their digits, vowels stay as "0" because they separate equal
+# codes, "h", "w" and everything that is not a letter are deleted, and "#"
+# marks a leading "h" or "w", which has no code of its own to drop
+SOUNDEX_TABLE = bytes.maketrans(
+    "".join(SOUNDEX_CODES).encode() + b"#",
+    "".join(SOUNDEX_CODES.values()).encode() + b"7",
+)
+SOUNDEX_DELETE = bytes(
+    ch for ch in range(256) if chr(ch) not in {*SOUNDEX_CODES, "#", "\n"}
+)
+NON_LETTERS = bytes(
+    ch for ch in range(256) if chr(ch) not in string.ascii_lowercase + "\n"
+)
+LEADING_HW = re.compile(rb"^[^a-z\n]*[hw]", re.M)
+# a code followed by the same code is dropped; the empty replacement keeps
+# re.sub on its fast path, without a template expansion per match
+REPEATED_CODES = re.compile(rb"([0-6])(?=\1)")
+FIRST_CODE = re.compile(rb"^[0-7]", re.M)
+NON_DIGITS = re.compile(r"[^\d\n]+")
+NAME_NOISE = re.compile(r"[^\w\n]+|[\d_]+")
+
+
+def _lines(values: List[object]) -> str:
+    """Joins a column into one string with a line per value."""
+    try:
+        text = "\n".join(values)
+    except TypeError:
+        text = "\n".join(str(value) if value is not None else "" for value in values)
+    if text.count("\n") >= len(values):
+        text = "\n".join(
+            str(value).replace("\n", " ") if value is not None else ""
+            for value in values
+        )
+    return text
+
+
+def soundex_column(values: List[str | None]) -> List[str]:
+    """Soundex codes of a whole column, "" for values without latin letters."""
+    if not values:
+        return []
+    text = _lines(values).lower().encode("ascii", "ignore")
+    firsts = text.translate(None, NON_LETTERS).upper().split(b"\n")
+    codes = LEADING_HW.sub(b"#", text).translate(SOUNDEX_TABLE, SOUNDEX_DELETE)
+    # the first letter is kept as is, so its own code is dropped after the
+    # repeated codes are collapsed
+    codes = FIRST_CODE.sub(b"", REPEATED_CODES.sub(b"", codes))
+    codes = codes.replace(b"0", b"").split(b"\n")
+    return [
+        (first[:1] + code[:3] + b"000")[:4].decode() if first else ""
+        for first, code in zip(firsts, codes)
+    ]
+
+
+def soundex(word: str) -> str:
+    return soundex_column([word])[0]
+
+
+def clean_names(values: List[str | None]) -> List[str]:
+    """Lowercase letters of every name in a column, without spaces or signs."""
+    if not values:
+        return []
+    return NAME_NOISE.sub("", _lines(values)).lower().split("\n")
+
+
+def phone_column(values: List[object]) -> List[str]:
+    """Digits of every phone in a column, "" for missing ones."""
+    if not values:
+        return []
+    return NON_DIGITS.sub("", _lines(values)).split("\n")
+
+
+def normalize_email(email: str | None) -> str:
+    if not email:
+        return ""
+    local, _, domain = email.strip().lower().partition("@")
+    # user+tag@example.com is delivered to user@example.com
+    local = local.split("+", 1)[0]
+    return f"{local}@{domain}" if domain else local
+
+
+def similar_names(a: str, b: str) -> bool:
+    """Whether the names are equal or one insertion, deletion or substitution apart."""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    start = 0
+    while start < len(a) and a[start] == b[start]:
+        start += 1
+    skip = 1 if len(a) == len(b) else 0
+    return a[start + skip :] == b[start + 1 :]
+
+
+def find_clusters(
+    rows: Iterable[Tuple[int, str, str, str | None, object]],
+) -> List[Tuple[List[int], List[str]]]:
+    """Group (id, firstname, lastname, email, phone) rows into duplicate clusters.
+
+    Blocking keys only propose candidates; two contacts are joined with the
+    union-find when the match is confirmed: the same normalized email, the
+    same phone, or the same mailbox name with the same name code and a
+    near-exact name. Equal email and phone keys confirm themselves, and
+    names are only coded and compared for contacts whose mailbox name is
+    shared, so the cost stays linear in the number of rows for real data.
+    Returns (contact ids, confirming keys) per cluster.
+    """
+    # only contacts that were joined with another one enter the union-find
+    parent: Dict[int, int] = {}
+    emails: Dict[str, int] = {}
+    phones: Dict[str, int] = {}
+    mailboxes: Dict[str, int] = {}
+    confirmed: List[Tuple[str, int]] = []
+
+    def find(item: int) -> int:
+        root = item
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while parent.get(item, item) != root:
+            parent[item], item = root, parent[item]
+        return root
+
+    def union(a: int, b: int, key: str) -> None:
+        root_a, root_b = find(a), find(b)
+        parent.setdefault(root_a, root_a)
+        parent.setdefault(root_b, root_b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+        confirmed.append((key, b))
+
+    rows = list(rows)
+    boxes = []
+    candidates = set()
+    for index, (row, phone) in enumerate(
+        zip(rows, phone_column([row[4] for row in rows]))
+    ):
+        contact_id, email = row[0], normalize_email(row[3])
+        if email:
+            other = emails.setdefault(email, contact_id)
+            if other != contact_id:
+                union(other, contact_id, f"email:{email}")
+        if phone:
+            other = phones.setdefault(phone, contact_id)
+            if other != contact_id:
+                union(other, contact_id, f"phone:{phone}")
+        mailbox = email.partition("@")[0]
+        boxes.append(mailbox)
+        first = mailboxes.setdefault(mailbox, index)
+        if first != index:
+            candidates.update((first, index))
+
+    candidates = sorted(candidates)
+    firstnames = [rows[index][1] for index in candidates]
+    lastnames = [rows[index][2] for index in candidates]
+    names: Dict[Tuple[str, str], List[Tuple[int, str]]] = defaultdict(list)
+    for index, first_code, last_code, first, last in zip(
+        candidates,
+        soundex_column(firstnames),
+        soundex_column(lastnames),
+        clean_names(firstnames),
+        clean_names(lastnames),
+    ):
+        # names without latin letters keep their own spelling as the code
+        first_code, last_code = first_code or first, last_code or last
+        if not first_code or not last_code:
+            continue
+        # sorted, so that swapped first and last names still match
+        if first_code > last_code:
+            first_code, last_code, first, last = last_code, first_code, last, first
+        code = f"{first_code}:{last_code}"
+        name = f"{first} {last}"
+        contact_id = rows[index][0]
+        block = names[(code, boxes[index])]
+        for other, other_name in block:
+            if similar_names(name, other_name):
+                union(other, contact_id, f"name:{code}")
+                break
+        else:
+            block.append((contact_id, name))
+
+    members: Dict[int, List[int]] = defaultdict(list)
+    for contact_id in parent:
+        members[find(contact_id)].append(contact_id)
+    shared: Dict[int, Set[str]] = defaultdict(set)
+    for key, contact_id in confirmed:
+        shared[find(contact_id)].add(key)
+
+    clusters = [(sorted(ids), sorted(shared[root])) for root, ids in members.items()]
+    clusters.sort(key=lambda cluster: cluster[0][0])
+    return clusters
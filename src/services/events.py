@@ -0,0 +1,111 @@
+import asyncio
+import json
+from collections import defaultdict
+from typing import AsyncIterator, Dict, Set
+
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+from src.database.models import Contact, ContactTombstone
+from src.services.redis_client import redis_client
+
+CHANNEL_PREFIX = "contacts:"
+
+
+def contact_upserted(contact: Contact) -> dict:
+    return {"op": "upsert", "id": contact.id, "version": contact.version}
+
+
+def contact_deleted(tombstone: ContactTombstone) -> dict:
+    return {"op": "delete", "id": tombstone.contact_id, "version": tombstone.version}
+
+
+class ContactEvents:
+    """Publishes contact changes to Redis and fans them out to local streams.
+
+    Every worker process keeps a single pattern subscription and hands the
+    messages to the in-process queues of the user's connected clients.
+    """
+
+    def __init__(self):
+        self.subscribers: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+        self.listener: asyncio.Task | None = None
+
+    async def publish(self, user_id: int, *events: dict) -> None:
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for event in events:
+                    pipe.publish(
+                        f"{CHANNEL_PREFIX}{user_id}",
+                        json.dumps(event, separators=(",", ":")),
+                    )
+                await pipe.execute()
+        except RedisError as e:
+            # the change is committed already, clients catch up through /changes
+            print(e)
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(settings.stream_queue_size)
+        self.subscribers[user_id].add(queue)
+        if self.listener is None or self.listener.done():
+            self.listener = asyncio.create_task(self._listen())
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue) -> None:
+        subscribers = self.subscribers.get(user_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self.subscribers[user_id]
+
+    async def stream(self, user_id: int) -> AsyncIterator[str]:
+        queue = self.subscribe(user_id)
+        try:
+            while True:
+                try:
+                    data = await asyncio.wait_for(
+                        queue.get(), settings.stream_heartbeat_seconds
+                    )
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                if data is None:
+                    break
+                yield f"data: {data}\n\n"
+        finally:
+            self.unsubscribe(user_id, queue)
+
+    async def close(self) -> None:
+        if self.listener is not None:
+            self.listener.cancel()
+            self.listener = None
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                async for message in pubsub.listen():
+                    self._dispatch(message["channel"], message["data"])
+            except RedisError as e:
+                print(e)
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.reset()
+
+    def _dispatch(self, channel: str, data: str) -> None:
+        user_id = int(channel[len(CHANNEL_PREFIX) :])
+        for queue in list(self.subscribers.get(user_id, ())):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                # slow clients are dropped instead of buffered, they resync
+                # through /changes when they reconnect
+                self.unsubscribe(user_id, queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+
+contact_events = ContactEvents()
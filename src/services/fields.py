@@ -0,0 +1,58 @@
+from functools import lru_cache
+from typing import Any, List, Tuple, Type
+
+from fastapi import HTTPException, Query, Response, status
+from pydantic import BaseModel, ConfigDict, TypeAdapter, create_model
+
+from src.schemas import ContactResponse
+
+
+def contact_fields(
+    fields: str | None = Query(
+        None, description="Comma separated list of contact fields to return"
+    ),
+) -> Tuple[str, ...] | None:
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - ContactResponse.model_fields.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+        )
+    # id is always returned, and the schema order makes equal sets share a cache entry
+    requested.add("id")
+    return tuple(name for name in ContactResponse.model_fields if name in requested)
+
+
+@lru_cache(maxsize=128)
+def contact_fields_model(fields: Tuple[str, ...]) -> Type[BaseModel]:
+    return create_model(
+        "ContactFields",
+        __config__=ConfigDict(from_attributes=True),
+        **{
+            name: (ContactResponse.model_fields[name].annotation, ...)
+            for name in fields
+        },
+    )
+
+
+@lru_cache(maxsize=128)
+def contact_fields_adapter(fields: Tuple[str, ...]) -> TypeAdapter:
+    return TypeAdapter(List[contact_fields_model(fields)])
+
+
+def dump_contacts(contacts: List[Any], fields: Tuple[str, ...]) -> List[dict]:
+    adapter = contact_fields_adapter(fields)
+    return adapter.dump_python(
+        adapter.validate_python(contacts, from_attributes=True), mode="json"
+    )
+
+
+def contacts_response(contacts: List[Any], fields: Tuple[str, ...]) -> Response:
+    adapter = contact_fields_adapter(fields)
+    return Response(
+        adapter.dump_json(adapter.validate_python(contacts, from_attributes=True)),
+        media_type="application/json",
+    )
@@ -0,0 +1,29 @@
+import re
+
+from src.conf.config import settings
+
+# the trunk prefix written in brackets after the country code, as in
+# "+380 (0)67 123 4567"; it is not dialled from abroad
+TRUNK_ZERO = re.compile(r"\(\s*0\s*\)")
+SEPARATORS = re.compile(r"[\s\-().]")
+# [0-9] rather than \d or str.isdigit(), which accept non-ASCII digits too
+E164_DIGITS = re.compile(r"[0-9]{8,15}")
+
+
+def normalize_phone(number: str | int) -> str:
+    """Bring a phone number to E.164 form, e.g. "+380671234567".
+
+    Numbers without "+" or "00" are national ones: the trunk "0" is dropped
+    and settings.default_phone_country_code is put in front. A trunk "0" in
+    brackets after the country code, "+380 (0)67 ...", is dropped as well.
+    """
+    number = SEPARATORS.sub("", TRUNK_ZERO.sub("", str(number)))
+    if number.startswith("+"):
+        digits = number[1:]
+    elif number.startswith("00"):
+        digits = number[2:]
+    else:
+        digits = settings.default_phone_country_code + number.removeprefix("0")
+    if not E164_DIGITS.fullmatch(digits):
+        raise ValueError("Invalid phone number")
+    return f"+{digits}"
@@ -0,0 +1,11 @@
+import redis.asyncio as redis
+
+from src.conf.config import settings
+
+redis_client = redis.Redis(
+    host=settings.redis_host,
+    port=settings.redis_port,
+    db=0,
+    encoding="utf-8",
+    decode_responses=True,
+)
@@ -0,0 +1,134 @@
+from collections import Counter
+from typing import AsyncIterator, Dict, List
+
+from redis.exceptions import RedisError
+
+from src.database.models import Contact
+from src.services.redis_client import redis_client
+
+STATS_PREFIX = "contact_stats:"
+
+# counters are only moved while the hash exists, a missing hash is rebuilt
+# from the database on the next read
+INCREMENT_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    for i = 1, #ARGV, 2 do
+        redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+end
+"""
+
+# The recount replaces a hash only if it still holds the values read before
+# the count; an increment applied in between makes it skip the user, whose
+# counters are then already moving with the database again.
+# KEYS[1] hash, ARGV[1] number n of expected fields, then n expected
+# field/value pairs, then the new field/value pairs
+STORE_SCRIPT = """
+local n = tonumber(ARGV[1])
+if redis.call('HLEN', KEYS[1]) ~= n then
+    return 0
+end
+for i = 2, 2 * n, 2 do
+    if redis.call('HGET', KEYS[1], ARGV[i]) ~= ARGV[i + 1] then
+        return 0
+    end
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], unpack(ARGV, 2 * n + 2))
+return 1
+"""
+
+# only one worker recounts per interval, outside the contact_stats: keys
+RECONCILE_LEASE = "contact_stats_reconcile"
+
+
+def _pairs(mapping: Dict[str, int]) -> list:
+    return [item for pair in mapping.items() for item in pair]
+
+
+def contact_counters(contact: Contact | None) -> Counter:
+    counters = Counter()
+    if contact is None:
+        return counters
+    counters["total"] = 1
+    counters["done"] = int(bool(contact.done))
+    if contact.birthday is not None:
+        counters[f"birthday:{contact.birthday.month}"] = 1
+    return counters
+
+
+class ContactStats:
+    """Per-user contact counters kept in a Redis hash."""
+
+    def __init__(self):
+        self.increment = redis_client.register_script(INCREMENT_SCRIPT)
+        self.compare_and_store = redis_client.register_script(STORE_SCRIPT)
+
+    async def apply(self, user_id: int, before: Counter, after: Counter) -> None:
+        delta = Counter(after)
+        delta.subtract(before)
+        args = []
+        for field, value in delta.items():
+            if value:
+                args += [field, value]
+        if not args:
+            return
+        try:
+            await self.increment(keys=[f"{STATS_PREFIX}{user_id}"], args=args)
+        except RedisError as e:
+            # the reconciliation job repairs the drift
+            print(e)
+
+    async def get(self, user_id: int) -> Dict[str, int] | None:
+        try:
+            counters = await redis_client.hgetall(f"{STATS_PREFIX}{user_id}")
+        except RedisError as e:
+            print(e)
+            return None
+        if not counters:
+            return None
+        return {field: int(value) for field, value in counters.items()}
+
+    async def get_many(self, user_ids: List[int]) -> Dict[int, Dict[str, int]]:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.hgetall(f"{STATS_PREFIX}{user_id}")
+            hashes = await pipe.execute()
+        return {
+            user_id: {field: int(value) for field, value in counters.items()}
+            for user_id, counters in zip(user_ids, hashes)
+        }
+
+    async def store(
+        self, user_id: int, counters: Dict[str, int], expected: Dict[str, int]
+    ) -> bool:
+        """Replaces the user's counters if the hash still holds `expected`.
+
+        `expected` is what the hash held before `counters` were counted, an
+        empty dict for a missing hash. Returns whether the hash was replaced.
+        """
+        mapping = {"total": 0, "done": 0, **counters}
+        args = [len(expected), *_pairs(expected), *_pairs(mapping)]
+        try:
+            stored = await self.compare_and_store(
+                keys=[f"{STATS_PREFIX}{user_id}"], args=args
+            )
+        except RedisError as e:
+            print(e)
+            return False
+        return bool(stored)
+
+    async def claim_reconcile(self, seconds: int) -> bool:
+        # the lease is left to expire, so the other workers skip this interval
+        try:
+            return bool(await redis_client.set(RECONCILE_LEASE, 1, nx=True, ex=seconds))
+        except RedisError as e:
+            print(e)
+            return False
+
+    async def cached_users(self) -> AsyncIterator[int]:
+        async for key in redis_client.scan_iter(match=f"{STATS_PREFIX}*"):
+            yield int(key[len(STATS_PREFIX) :])
+
+
+contact_stats = ContactStats()
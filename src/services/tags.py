@@ -0,0 +1,36 @@
+from typing import Iterable, List, NamedTuple, Tuple
+
+from fastapi import HTTPException, Query, status
+
+TAG_MAX_LENGTH = 30
+MAX_TAGS_PER_CONTACT = 20
+
+
+def normalize_tags(tags: Iterable[str]) -> List[str]:
+    normalized = []
+    for tag in tags:
+        tag = tag.strip().lower()
+        if not tag or len(tag) > TAG_MAX_LENGTH:
+            raise ValueError(f"Tags must be 1 to {TAG_MAX_LENGTH} characters long")
+        if tag not in normalized:
+            normalized.append(tag)
+    return normalized
+
+
+class TagFilter(NamedTuple):
+    any_of: Tuple[str, ...]
+    all_of: Tuple[str, ...]
+
+
+def tag_filter(
+    tags_any: List[str] = Query(None, description="Contacts with any of these tags"),
+    tags_all: List[str] = Query(None, description="Contacts with all of these tags"),
+) -> TagFilter | None:
+    if not tags_any and not tags_all:
+        return None
+    try:
+        return TagFilter(
+            tuple(normalize_tags(tags_any or ())), tuple(normalize_tags(tags_all or ()))
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))